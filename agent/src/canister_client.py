@@ -1,192 +1,820 @@
+"""
+HTTP-gateway client for the DeGov Oracle canister.
+
+If uvloop is installed (``pip install uvloop``; not available on Windows)
+it is set as the asyncio event-loop policy on import, unless the
+application already chose a non-default policy.
+"""
+
+import aiohttp
 import asyncio
+import hashlib
+import itertools
 import logging
-import time
-from typing import Dict, Any, List
 import random
+import struct
+import sys
+import types
+import time  # Fix #1: Added missing import
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Awaitable, Dict, Any, List, Tuple
+from urllib.parse import urlsplit, parse_qs
 
-from ic.client import Client
-from ic.identity import Identity
-from ic.agent import Agent as IcAgent
+try:
+    # Bind the C extension's functions directly so calls skip the cbor2
+    # package layer and never land on the pure-Python encoder.
+    from _cbor2 import dumps as cbor_dumps, loads as cbor_loads
+except ImportError:
+    from cbor2 import dumps as cbor_dumps, loads as cbor_loads
 from ic.candid import Types, encode, decode
+from ic.principal import Principal
+from yarl import URL
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s %(message)s',
-)
+try:
+    # Optional HTTP/2 transport (pip install "httpx[http2]")
+    import h2  # noqa: F401
+    import httpx
+except ImportError:
+    httpx = None
+
+if sys.platform != "win32" and type(asyncio.get_event_loop_policy()) is asyncio.DefaultEventLoopPolicy:
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
+# Handlers and levels are left to the application
 _LOG = logging.getLogger("canister_client")
-_LOG.setLevel(logging.DEBUG)
+_LOG.addHandler(logging.NullHandler())
+
+# cbor2 >= 6 is native itself; older releases ship the _cbor2 extension.
+# Anything else means every envelope goes through the pure-Python codec.
+if not isinstance(cbor_dumps, types.BuiltinFunctionType):
+    _LOG.warning("cbor2 C extension not available; CBOR encoding falls back to pure Python")
+
+# One pooled session per (event loop, boundary node), shared by every
+# CanisterClient so keep-alive connections and TLS sessions are reused across
+# instances. Sessions are bound to the loop that created them, hence the loop
+# in the key: a later asyncio.run() gets fresh ones. Lookup and creation never
+# await, so no lock is needed to keep a loop from creating duplicates.
+_SESSIONS: dict[Tuple[asyncio.AbstractEventLoop, str], aiohttp.ClientSession] = {}
+_HTTP2_CLIENTS: dict[Tuple[asyncio.AbstractEventLoop, str], "httpx.AsyncClient"] = {}
+# In-flight request cap shared with the pooled session, sized by the
+# max_in_flight of the first client to use it. It is the only limit on
+# concurrent requests, so the connectors below are left unbounded and no
+# request ever queues for a pool slot inside aiohttp's connect timeout.
+_LIMITERS: dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Semaphore] = {}
+
+
+def _drop_closed_loops(pool: dict) -> None:
+    """Forget pooled entries whose event loop has been closed; they can no longer be used or closed."""
+    for key in [key for key in pool if key[0].is_closed()]:
+        del pool[key]
+
+# Candid/CBOR work on payloads larger than this runs in a worker thread so a
+# long proposal description does not stall every other request on the loop.
+_OFFLOAD_BYTES = 4096
+
+# Upper bound on how much of a non-200 response body is read for the error message.
+_ERROR_BODY_LIMIT = 4096
+
+# Entry cap for the per-client query reply cache; it is simply cleared when full.
+_QUERY_CACHE_MAX = 256
+
+# read_state polling schedule for update calls: exponential backoff from
+# _POLL_BASE_DELAY up to _POLL_MAX_DELAY, giving up after _POLL_TIMEOUT.
+# Kept under the default call_timeout so a slow update reports that it was
+# accepted but has not finished, rather than the generic call timeout.
+_POLL_BASE_DELAY = 0.05
+_POLL_MAX_DELAY = 1.0
+_POLL_TIMEOUT = 20.0
+
+# Transport failures and gateway statuses worth retrying. Resending the same
+# envelope is safe for update calls too: the IC deduplicates by request ID.
+_RETRY_ATTEMPTS = 3
+_RETRY_BASE_DELAY = 0.05
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+_TRANSIENT_ERRORS: Tuple[type, ...] = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+if httpx is not None:
+    _TRANSIENT_ERRORS += (httpx.TransportError,)
+
+
+@dataclass(slots=True, frozen=True)
+class CanisterResult:
+    """Outcome of a canister call: data on success, error message otherwise."""
+    success: bool
+    data: Any = None
+    error: str | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def __getitem__(self, key: str) -> Any:
+        # Lets callers still written against the old result dicts keep working
+        return getattr(self, key)
+
+
+# CBOR encodings of the fixed content-map keys, so envelopes are written out
+# directly instead of building a dict for cbor2 to walk. The header opens the
+# outer {"content": ...} map; the inner map has 6 entries for queries and 7
+# for calls, which also carry a nonce.
+_ENVELOPE_HEADER = b"\xa1" + cbor_dumps("content")
+_CONTENT_MAP_HEADER = {True: b"\xa6", False: b"\xa7"}
+_K_REQUEST_TYPE = cbor_dumps("request_type")
+_K_SENDER = cbor_dumps("sender")
+_K_CANISTER_ID = cbor_dumps("canister_id")
+_K_METHOD_NAME = cbor_dumps("method_name")
+_K_ARG = cbor_dumps("arg")
+_K_INGRESS_EXPIRY = cbor_dumps("ingress_expiry")
+_K_NONCE = cbor_dumps("nonce")
+
+# Update calls carry a random nonce so identical calls made within one expiry
+# window are still separate submissions with distinct request IDs.
+_NONCE_BYTES = 8
+
+# All requests are sent unsigned, from the anonymous principal
+_ANON_SENDER = Principal.anonymous().bytes
+
+# Replica hosts served from _MOCK_RESPONSES instead of the network
+_LOCAL_HOSTS = frozenset({"127.0.0.1", "localhost", "0.0.0.0"})
+
+# Canned local-testing replies, shared between calls; callers must not mutate them.
+_MOCK_RESPONSES: Dict[str, CanisterResult] = {
+    "getProposal": CanisterResult(True, {
+        "id": 1,
+        "title": "Mock Proposal",
+        "description": "A mock proposal for testing",
+        "status": {"Active": None},
+        "votes": (("For", 3), ("Against", 1)),
+    }),
+    "getActiveProposals": CanisterResult(True, (
+        {"id": 1, "title": "Mock Proposal 1", "status": {"Active": None}},
+        {"id": 2, "title": "Mock Proposal 2", "status": {"Active": None}},
+    )),
+    "castVote": CanisterResult(True, "Vote cast successfully"),
+    "getProposalResults": CanisterResult(True, (("For", 5), ("Against", 2))),
+}
+_MOCK_UNKNOWN_METHOD = CanisterResult(False, error="Unknown method")
+# Mock createProposal IDs: sequential, like the canister's own counter
+_MOCK_PROPOSAL_IDS = itertools.count(1)
+
+# ingress_expiry only needs seconds resolution against a 5-minute window,
+# so the wall-clock value is recomputed at most every _EXPIRY_REFRESH seconds.
+# The encoded envelope field is cached alongside it for the same window.
+_INGRESS_WINDOW_NS = 300 * 1_000_000_000
+_EXPIRY_REFRESH = 1.0
+_expiry_checked_at = float("-inf")
+_expiry_ns = 0
+_expiry_field = b""
+
+
+def _refresh_expiry() -> None:
+    global _expiry_checked_at, _expiry_ns, _expiry_field
+    now = time.monotonic()
+    if now - _expiry_checked_at > _EXPIRY_REFRESH:
+        _expiry_checked_at = now
+        _expiry_ns = time.time_ns() + _INGRESS_WINDOW_NS
+        _expiry_field = _K_INGRESS_EXPIRY + cbor_dumps(_expiry_ns)
+
+
+def _ingress_expiry() -> int:
+    _refresh_expiry()
+    return _expiry_ns
+
+
+def _ingress_expiry_field() -> Tuple[int, bytes]:
+    """Current ingress_expiry and its pre-encoded envelope key/value pair."""
+    _refresh_expiry()
+    return _expiry_ns, _expiry_field
+
+
+def _leb128(n: int) -> bytes:
+    """Unsigned LEB128 encoding, as used by the IC request-id hash for integers."""
+    if n < 0:
+        raise ValueError(f"LEB128 needs a non-negative integer, got {n}")
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+# Candid argument types, built once rather than per call
+# (CreateProposalRequest and VoteRequest in canister/src/degov_oracle/types.mo)
+_PROPOSAL_REQUEST = Types.Record({
+    "title": Types.Text,
+    "description": Types.Text,
+    "options": Types.Vec(Types.Text),
+    "duration_hours": Types.Nat,
+})
+_VOTE_REQUEST = Types.Record({"proposal_id": Types.Nat, "option": Types.Text, "voter_id": Types.Text})
+
+# Candid return types per method (main.mo). A reply's own type table only
+# carries label hashes, so decoding against these is what restores the
+# record field and variant names.
+_PROPOSAL = Types.Record({
+    "id": Types.Nat,
+    "title": Types.Text,
+    "description": Types.Text,
+    "options": Types.Vec(Types.Text),
+    "votes": Types.Vec(Types.Tuple(Types.Text, Types.Nat)),
+    "voters": Types.Vec(Types.Text),
+    "created": Types.Int,
+    "deadline": Types.Int,
+    "status": Types.Variant({"Active": Types.Null, "Closed": Types.Null}),
+    "creator": Types.Text,
+})
+_RETURN_TYPES = {
+    "createProposal": Types.Variant({"ok": Types.Nat, "err": Types.Text}),
+    "castVote": Types.Variant({"ok": Types.Text, "err": Types.Text}),
+    "getProposal": Types.Variant({"ok": _PROPOSAL, "err": Types.Text}),
+    "getActiveProposals": Types.Vec(_PROPOSAL),
+    "getProposalResults": Types.Variant({"ok": Types.Vec(Types.Tuple(Types.Text, Types.Nat)), "err": Types.Text}),
+}
+
+# Candid header for a single `nat` argument: magic, empty type table, one arg of type nat (0x7d).
+# Those arguments are written directly; a nat's Candid value is its LEB128 encoding.
+_CANDID_NAT_PREFIX = b"DIDL\x00\x01\x7d"
+
+# Candid encoding of an empty argument list (getActiveProposals)
+_EMPTY_ARGS = encode([])
+
+
+def _cbor_bytes_header(length: int) -> bytes:
+    """CBOR byte-string (major type 2) header for a payload of the given length."""
+    if length < 24:
+        return bytes((0x40 | length,))
+    if length < 0x100:
+        return struct.pack(">BB", 0x58, length)
+    if length < 0x10000:
+        return struct.pack(">BH", 0x59, length)
+    if length < 0x100000000:
+        return struct.pack(">BI", 0x5A, length)
+    return struct.pack(">BQ", 0x5B, length)
+
+
+def _skip_encode(params: List[Dict[str, Any]]) -> bytes:
+    """encode() stand-in for local clients: their mocks never read the arguments."""
+    return b""
+
+
+def _encode_nat_arg(n: int) -> bytes:
+    """Candid encoding of a single `nat` argument; raises ValueError for anything but an int >= 0."""
+    # Validated outside the cache: lru_cache keys 1.0 and True the same as 1,
+    # so checking inside it would let those hit an entry cached for the int.
+    if isinstance(n, bool) or not isinstance(n, int) or n < 0:
+        raise ValueError(f"expected a non-negative integer, got {n!r}")
+    return _encode_nat(n)
+
+
+@lru_cache(maxsize=1024)
+def _encode_nat(n: int) -> bytes:
+    return _CANDID_NAT_PREFIX + _leb128(n)
+
+
+def _hash_value(value: Any) -> bytes:
+    if isinstance(value, str):
+        value = value.encode()
+    elif isinstance(value, int):
+        value = _leb128(value)
+    elif isinstance(value, list):
+        value = b"".join(_hash_value(v) for v in value)
+    return hashlib.sha256(value).digest()
+
+
+def _field_hash(key: str, value: Any) -> bytes:
+    return hashlib.sha256(key.encode()).digest() + _hash_value(value)
+
+
+def _request_id(content: Dict[str, Any], static_fields: Tuple[bytes, ...] = ()) -> bytes:
+    """
+    Representation-independent hash of a request content map (IC spec).
+    static_fields are already-hashed fields not repeated in content.
+    """
+    fields = sorted([*static_fields, *(_field_hash(k, v) for k, v in content.items())])
+    return hashlib.sha256(b"".join(fields)).digest()
+
+
+def _find_label(tree: list, label: bytes):
+    if tree[0] == 1:  # Fork
+        return _find_label(tree[1], label) or _find_label(tree[2], label)
+    if tree[0] == 2 and tree[1] == label:  # Labeled
+        return tree[2]
+    return None
+
+
+def _lookup_path(tree: list, path: List[bytes]):
+    """Return the leaf value at path in a certificate hash tree, if present."""
+    for label in path:
+        tree = _find_label(tree, label)
+        if tree is None:
+            return None
+    return tree[1] if tree[0] == 3 else None
 
 class CanisterClient:
     """
-    ICP client using the ic-py Agent API for type-safe communication with canisters.
-    Includes mock responses for local testing.
+    ICP HTTP-gateway client with Candid-typed arguments for type-safe
+    communication with the Motoko canister. Includes mock responses for local testing.
     """
 
-    def __init__(self, canister_url: str):
-        # Parse canister URL to extract canister ID
-        if "canisterId=" in canister_url:
-            self.canister_id = canister_url.split("canisterId=")[1].split("&")[0]
-            self.is_local = "127.0.0.1" in canister_url or "localhost" in canister_url
-        elif ".icp0.io" in canister_url:
-            self.canister_id = canister_url.split("://")[1].split(".")[0]
-            self.is_local = False
-        elif ".raw.icp0.io" in canister_url:
-            self.canister_id = canister_url.split("://")[1].split(".")[0]
-            self.is_local = False
+    # Candid encoder for update arguments; local clients rebind it to _skip_encode
+    _encode = staticmethod(encode)
+
+    def __init__(
+        self, canister_url: str, use_http2: bool = True, query_cache_ttl: float = 0.5,
+        max_in_flight: int = 64, call_timeout: float | None = 30.0,
+    ):
+        # Fix #4: Improved Canister URL Parsing
+        parts = urlsplit(canister_url)
+        query = parse_qs(parts.query)
+        if "canisterId" in query:
+            self.canister_id = query["canisterId"][0]
+            self.boundary_node_url = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        elif parts.hostname and parts.hostname.endswith(".icp0.io"):
+            # <id>.icp0.io and <id>.raw.icp0.io
+            self.canister_id = parts.hostname.split(".", 1)[0]
+            self.boundary_node_url = "https://icp0.io"
         else:
-            # Assume it's a plain canister ID
+            # For plain canister IDs, default to production
             self.canister_id = canister_url
-            self.is_local = "127.0.0.1" in canister_url or "localhost" in canister_url
-        
-        # Initialize IC Agent
-        self.identity = Identity()
-        
-        if self.is_local:
-            self.client = Client(url="http://127.0.0.1:4943")
-        else:
-            self.client = Client(url="https://ic0.app")
-            
-        self.ic_agent = IcAgent(self.identity, self.client)
+            self.boundary_node_url = "https://icp0.io"
+
+        # Local replicas are served from mocks, so no arguments are Candid-encoded
+        # and no envelope is ever built for them
+        self._is_local = parts.hostname in _LOCAL_HOSTS
+        if self._is_local:
+            # Bound once so the public methods need no per-call local/remote branch
+            self._encode = _skip_encode
+            self._call_canister = self._mock_call
+
+        canister_principal = None
+        if not self._is_local:
+            # ic-py fails on malformed text with TypeError or binascii.Error
+            try:
+                canister_principal = Principal.from_str(self.canister_id).bytes
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"invalid canister id {self.canister_id!r}") from exc
 
-    async def _mock_response(self, method: str) -> Dict[str, Any]:
-        """Mock responses for local testing"""
+        # The sender and target never change for a client, so the invariant
+        # part of every request's content map is built once here.
+        self._content_template = {} if self._is_local else {
+            "sender": _ANON_SENDER,
+            "canister_id": canister_principal,
+        }
+        # Pre-encoded {"content": {...}} framing up to the per-call fields, one per request type
+        self._envelope_prefix = {} if self._is_local else {
+            is_query: b"".join((
+                _ENVELOPE_HEADER, _CONTENT_MAP_HEADER[is_query],
+                _K_REQUEST_TYPE, cbor_dumps(request_type),
+                _K_SENDER, cbor_dumps(self._content_template["sender"]),
+                _K_CANISTER_ID, cbor_dumps(self._content_template["canister_id"]),
+            ))
+            for is_query, request_type in ((True, "query"), (False, "call"))
+        }
+        # Per-method skeletons (framing + method_name + arg key), filled on first use
+        self._method_prefix: Dict[Tuple[str, bool], bytes] = {}
+        # Request-id hashes of the fields fixed per update method; only arg
+        # and ingress_expiry are hashed per call.
+        self._call_field_hashes: Dict[str, Tuple[bytes, ...]] = {}
+
+        # Pre-parsed endpoint URLs so aiohttp does not re-parse them per request
+        api_base = f"{self.boundary_node_url.rstrip('/')}/api/v2/canister/{self.canister_id}"
+        self._query_url = URL(f"{api_base}/query", encoded=True)
+        self._call_url = URL(f"{api_base}/call", encoded=True)
+        self._read_state_url = URL(f"{api_base}/read_state", encoded=True)
+
+        # HTTP/2 multiplexes concurrent calls over one connection; falls back
+        # to the aiohttp HTTP/1.1 pool when httpx/h2 are not installed.
+        self._use_http2 = use_http2 and httpx is not None
+
+        # Caps concurrent POSTs per boundary node so large fan-outs queue in
+        # the pooled limiter instead of overrunning the connection pool.
+        self._max_in_flight = max_in_flight
+
+        # Overall deadline per call, covering retries and read_state polling,
+        # so a stalled replica cannot hold a caller indefinitely (None: no limit).
+        self._call_timeout = call_timeout
+
+        # Short-lived cache of successful query replies plus the in-flight
+        # query tasks, so bursts of identical reads share one round trip.
+        self._query_cache_ttl = query_cache_ttl
+        self._query_cache: Dict[Tuple[str, bytes], Tuple[float, CanisterResult]] = {}
+        self._inflight: Dict[Tuple[str, bytes], asyncio.Future] = {}
+        # Bumped by every successful update; queries started under an older
+        # generation may predate the change, so they are neither joined nor cached.
+        self._query_generation = 0
+        # read_state pollers by request ID, so concurrent await_result calls
+        # for one submission share the poll.
+        self._pending_updates: Dict[bytes, asyncio.Future] = {}
+
+    async def __aenter__(self) -> "CanisterClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def _limiter(self) -> asyncio.Semaphore:
+        key = (asyncio.get_running_loop(), self.boundary_node_url)
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            _drop_closed_loops(_LIMITERS)
+            limiter = _LIMITERS[key] = asyncio.Semaphore(self._max_in_flight)
+        return limiter
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        key = (asyncio.get_running_loop(), self.boundary_node_url)
+        session = _SESSIONS.get(key)
+        if session is not None and not session.closed:
+            return session
+        _drop_closed_loops(_SESSIONS)
+        session = _SESSIONS[key] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=0,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+            ),
+            timeout=aiohttp.ClientTimeout(total=30, connect=5),
+            headers={"Content-Type": "application/cbor"},
+        )
+        return session
+
+    async def _get_http2_client(self) -> "httpx.AsyncClient":
+        key = (asyncio.get_running_loop(), self.boundary_node_url)
+        client = _HTTP2_CLIENTS.get(key)
+        if client is not None and not client.is_closed:
+            return client
+        _drop_closed_loops(_HTTP2_CLIENTS)
+        client = _HTTP2_CLIENTS[key] = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=64, keepalive_expiry=75.0),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            headers={"Content-Type": "application/cbor"},
+        )
+        return client
+
+    async def _send(self, url: URL, envelope: bytes) -> Tuple[int, bytes | bytearray]:
+        """POST an envelope, retrying transient failures with jittered exponential backoff."""
+        for attempt in range(_RETRY_ATTEMPTS):
+            last = attempt == _RETRY_ATTEMPTS - 1
+            try:
+                status, body = await self._send_once(url, envelope)
+            except _TRANSIENT_ERRORS as exc:
+                if last:
+                    raise
+                _LOG.debug("Retrying %s after %r", url.path, exc)
+            else:
+                if status not in _RETRY_STATUSES or last:
+                    return status, body
+                _LOG.debug("Retrying %s after HTTP %s", url.path, status)
+            await asyncio.sleep(_RETRY_BASE_DELAY * 2 ** attempt + random.random() * _RETRY_BASE_DELAY)
+
+    async def _send_once(self, url: URL, envelope: bytes) -> Tuple[int, bytes | bytearray]:
+        """POST an envelope and return (status, body); non-200 bodies are capped."""
+        async with self._limiter():
+            if self._use_http2:
+                client = await self._get_http2_client()
+                async with client.stream("POST", str(url), content=envelope) as resp:
+                    if resp.status_code == 200:
+                        return 200, await resp.aread()
+                    body = bytearray()
+                    async for chunk in resp.aiter_bytes():
+                        body += chunk
+                        if len(body) >= _ERROR_BODY_LIMIT:
+                            break
+                    return resp.status_code, bytes(body[:_ERROR_BODY_LIMIT])
+
+            session = await self._get_session()
+            async with session.post(url, data=envelope) as resp:
+                if resp.status == 200:
+                    # Accumulate chunks in one growable buffer; the decoder reads it via memoryview
+                    body = bytearray()
+                    async for chunk in resp.content.iter_any():
+                        body += chunk
+                    return 200, body
+                # Error pages from the boundary node can be large HTML; only read the head
+                return resp.status, await resp.content.read(_ERROR_BODY_LIMIT)
+
+    async def _mock_call(self, method: str, encoded_args: bytes, is_query: bool, submit_only: bool = False) -> CanisterResult:
+        """_call_canister stand-in for local clients: canned responses instead of network calls."""
         if method == "createProposal":
-            return {"success": True, "data": random.randint(1, 1000)}
-        elif method == "getProposal":
-            return {
-                "success": True,
-                "data": {
-                    "id": 1,
-                    "title": "Mock Proposal",
-                    "description": "A mock proposal for testing",
-                    "status": {"Active": None},
-                    "votes": [("For", 3), ("Against", 1)],
-                }
-            }
-        elif method == "getActiveProposals":
-            return {
-                "success": True,
-                "data": [
-                    {"id": 1, "title": "Mock Proposal 1", "status": {"Active": None}},
-                    {"id": 2, "title": "Mock Proposal 2", "status": {"Active": None}},
-                ]
-            }
-        elif method == "castVote":
-            return {"success": True, "data": "Vote cast successfully"}
-        elif method == "getProposalResults":
-            return {"success": True, "data": [("For", 5), ("Against", 2)]}
-        return {"success": False, "error": "Unknown method"}
-
-    async def _call_canister(self, method: str, encoded_args: bytes, is_query: bool) -> Dict[str, Any]:
-        """Generic method to call canister functions."""
-        # Use mocks for local testing if needed
-        if self.is_local and "mock" in method.lower():
-            return await self._mock_response(method)
+            return CanisterResult(True, next(_MOCK_PROPOSAL_IDS))
+        return _MOCK_RESPONSES.get(method, _MOCK_UNKNOWN_METHOD)
 
+    def _build_envelope(self, method: str, encoded_args: bytes, is_query: bool) -> Tuple[URL, bytes, bytes | None]:
+        """Build the target URL, CBOR request envelope and (for updates) request ID."""
+        assert not self._is_local, "local clients are served from mocks"
+        request_type = "query" if is_query else "call"
+        url = self._query_url if is_query else self._call_url
+
+        prefix = self._method_prefix.get((method, is_query))
+        if prefix is None:
+            prefix = self._envelope_prefix[is_query] + _K_METHOD_NAME + cbor_dumps(method) + _K_ARG
+            self._method_prefix[(method, is_query)] = prefix
+
+        ingress_expiry, expiry_field = _ingress_expiry_field()
+        # The arg is framed by hand so the join is the only copy of its bytes
+        envelope = b"".join((prefix, _cbor_bytes_header(len(encoded_args)), encoded_args, expiry_field))
+
+        request_id = None
+        if not is_query:
+            # Fresh per submission; retries resend these same envelope bytes
+            nonce = random.getrandbits(_NONCE_BYTES * 8).to_bytes(_NONCE_BYTES, "big")
+            envelope += _K_NONCE + _cbor_bytes_header(_NONCE_BYTES) + nonce
+            static_fields = self._call_field_hashes.get(method)
+            if static_fields is None:
+                static = self._content_template.copy()
+                static["request_type"] = request_type
+                static["method_name"] = method
+                static_fields = tuple(_field_hash(k, v) for k, v in static.items())
+                self._call_field_hashes[method] = static_fields
+            request_id = _request_id({"arg": encoded_args, "ingress_expiry": ingress_expiry, "nonce": nonce}, static_fields)
+        return url, envelope, request_id
+
+    @staticmethod
+    def _decode_candid(arg: bytes, method: str) -> CanisterResult:
+        """Decode a Candid reply against the method's return type, unwrapping Result's #ok/#err."""
+        decoded_result = decode(arg, _RETURN_TYPES[method])[0]["value"]
+        if isinstance(decoded_result, dict) and len(decoded_result) == 1:
+            if "ok" in decoded_result:
+                return CanisterResult(True, decoded_result["ok"])
+            if "err" in decoded_result:
+                return CanisterResult(False, error=decoded_result["err"])
+        return CanisterResult(True, decoded_result)
+
+    @staticmethod
+    def _decode_reply(raw_data: bytes | bytearray, method: str) -> CanisterResult:
+        """Decode a CBOR reply envelope and its Candid payload."""
+        # Only status and reply.arg / reject_message are read; the node
+        # signatures that come with the reply are ignored.
+        data = cbor_loads(memoryview(raw_data))
+        status = data.get("status")
+        if status == "replied":
+            return CanisterClient._decode_candid(data["reply"]["arg"], method)
+
+        if status == "rejected":
+            return CanisterResult(False, error=data.get("reject_message", "Rejected"))
+
+        return CanisterResult(False, error="Unknown response format")
+
+    async def _post_envelope(
+        self, url: URL, envelope: bytes, method: str, is_query: bool,
+        request_id: bytes | None = None, submit_only: bool = False,
+    ) -> CanisterResult:
+        """POST a pre-built envelope and decode the canister reply."""
         try:
-            if is_query:
-                result_bytes = self.ic_agent.query_raw(self.canister_id, method, encoded_args)
-                logging.debug(f"Query result for {method}: {result_bytes}")
-                return {"success": True, "data": result_bytes}
-            else:
-                result = self.ic_agent.update_raw(self.canister_id, method, encoded_args)
-                logging.debug(f"Update result for {method}: {result}")
-                return {"success": True, "data": result}
+            status, raw_data = await self._send(url, envelope)
+            _LOG.debug("HTTP status=%s for method %s", status, method)
+
+            # Fix #2: Correctly handle update call responses
+            if status == 202 and not is_query:
+                if submit_only:
+                    # The request ID lets the caller pick the outcome up later via await_result
+                    return CanisterResult(True, request_id)
+                return await self.await_result(request_id, method)
+
+            if status != 200:
+                body = raw_data.decode("utf-8", "replace")
+                if len(body) > 512:
+                    _LOG.warning("HTTP %s for method %s: %s", status, method, body)
+                    body = body[:512] + "... (truncated)"
+                return CanisterResult(False, error=f"HTTP {status}: {body}")
+
+            if len(raw_data) > _OFFLOAD_BYTES:
+                return await asyncio.to_thread(self._decode_reply, raw_data, method)
+            return self._decode_reply(raw_data, method)
+
+        except Exception as exc:
+            _LOG.exception("Exception in _call_canister for method %s", method)
+            return CanisterResult(False, error=f"Network error: {exc}")
+
+    async def await_result(self, request_id: bytes, method: str) -> CanisterResult:
+        """
+        Wait for the outcome of an accepted `method` update call, sharing one poller per request ID.
+        request_id is the data of a successful submit_only=True call.
+        """
+        task = self._pending_updates.get(request_id)
+        if task is None:
+            # The deadline sits inside the shared task: a waiter timing out
+            # must not leave a poller running on behalf of nobody.
+            task = asyncio.ensure_future(self._bounded(method, self._poll_request_status(request_id, method)))
+            self._pending_updates[request_id] = task
+            task.add_done_callback(lambda t: self._pending_updates.pop(request_id, None))
+        return await asyncio.shield(task)
 
+    async def _poll_request_status(self, request_id: bytes, method: str) -> CanisterResult:
+        """Poll read_state until an accepted update call has replied or been rejected."""
+        status_path = [b"request_status", request_id]
+        delay = _POLL_BASE_DELAY
+        deadline = time.monotonic() + _POLL_TIMEOUT
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _POLL_MAX_DELAY)
+
+                content = {
+                    "request_type": "read_state",
+                    "sender": self._content_template["sender"],
+                    "paths": [status_path],
+                    "ingress_expiry": _ingress_expiry(),
+                }
+                status, raw_data = await self._send(self._read_state_url, cbor_dumps({"content": content}))
+                if status != 200:
+                    continue
+
+                tree = cbor_loads(cbor_loads(memoryview(raw_data))["certificate"])["tree"]
+                status = _lookup_path(tree, status_path + [b"status"])
+                if status == b"replied":
+                    return self._decode_candid(_lookup_path(tree, status_path + [b"reply"]), method)
+                if status == b"rejected":
+                    message = _lookup_path(tree, status_path + [b"reject_message"]) or b""
+                    return CanisterResult(False, error=message.decode(errors="replace"))
+                if status == b"done":
+                    return CanisterResult(False, error="Update result is no longer available")
+
+            return CanisterResult(False, error="Timed out waiting for update result")
+
+        except Exception as exc:
+            _LOG.exception("Exception while polling update result")
+            return CanisterResult(False, error=f"Network error: {exc}")
+
+    async def _call_canister(self, method: str, encoded_args: bytes, is_query: bool, submit_only: bool = False) -> CanisterResult:
+        """Generic method to call canister functions with pre-encoded args."""
+        try:
+            url, envelope, request_id = self._build_envelope(method, encoded_args, is_query)
         except Exception as exc:
-            logging.exception(f"Exception in _call_canister for method {method}")
-            return {"success": False, "error": f"Canister call error: {exc}"}
+            _LOG.exception("Exception in _call_canister for method %s", method)
+            return CanisterResult(False, error=f"Encoding error: {exc}")
+
+        if is_query:
+            return await self._query(method, encoded_args, url, envelope)
+
+        result = await self._bounded(method, self._post_envelope(url, envelope, method, is_query, request_id, submit_only))
+        if result.success:
+            # Canister state changed; cached and in-flight reads may now be stale
+            self._query_generation += 1
+            self._query_cache.clear()
+            self._inflight.clear()
+        return result
+
+    async def _bounded(self, method: str, call: Awaitable[CanisterResult]) -> CanisterResult:
+        """Await a call, turning an overrun of call_timeout into a failed result."""
+        try:
+            return await asyncio.wait_for(call, self._call_timeout)
+        except asyncio.TimeoutError:
+            _LOG.warning("Canister call %s timed out after %ss", method, self._call_timeout)
+            return CanisterResult(False, error=f"Timed out after {self._call_timeout}s waiting for the canister")
+
+    async def _query(self, method: str, encoded_args: bytes, url: URL, envelope: bytes) -> CanisterResult:
+        """Run a query through the TTL cache, joining an identical in-flight request if any."""
+        key = (method, encoded_args)
+        cached = self._query_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._query_cache_ttl:
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            # Bounded inside the shared task so a stalled request ends (and frees
+            # its in-flight slot) at the deadline instead of absorbing later callers.
+            task = asyncio.ensure_future(self._bounded(method, self._post_envelope(url, envelope, method, is_query=True)))
+            self._inflight[key] = task
+            generation = self._query_generation
+            task.add_done_callback(lambda t: self._query_done(key, t, generation))
+        # Shield so one caller being cancelled does not cancel the shared request
+        return await asyncio.shield(task)
+
+    def _query_done(self, key: Tuple[str, bytes], task: asyncio.Future, generation: int) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if generation != self._query_generation:
+            return
+        if task.cancelled() or task.exception() is not None or self._query_cache_ttl <= 0:
+            return
+        result = task.result()
+        if result.success:
+            if len(self._query_cache) >= _QUERY_CACHE_MAX:
+                self._query_cache.clear()
+            self._query_cache[key] = (time.monotonic(), result)
 
-    async def create_proposal(self, title: str, description: str, options: List[str], duration_hours: int, creator: str) -> Dict[str, Any]:
+    async def create_proposal(self, title: str, description: str, options: List[str], duration_hours: int, creator: str, submit_only: bool = False) -> CanisterResult:
         """Create a new proposal"""
+        request_data = {"title": title, "description": description, "options": options, "duration_hours": duration_hours}
+        params = [
+            {"type": _PROPOSAL_REQUEST, "value": request_data},
+            {"type": Types.Text, "value": creator},
+        ]
         try:
-            # Encode the proposal request as a record
-            proposal_data = {
-                "title": title,
-                "description": description, 
-                "options": options,
-                "duration_hours": duration_hours
-            }
-            
-            # Encode parameters following your working pattern
-            encoded_args = encode([
-                {
-                    "type": Types.Record({
-                        "title": Types.Text,
-                        "description": Types.Text,
-                        "options": Types.Vec(Types.Text),
-                        "duration_hours": Types.Nat,
-                    }),
-                    "value": proposal_data
-                },
-                {"type": Types.Text, "value": creator}
-            ])
-            
-            return await self._call_canister("createProposal", encoded_args, is_query=False)
-        except Exception as e:
-            logging.error(f"Error in create_proposal: {e}")
-            return {"success": False, "error": str(e)}
-
-    async def cast_vote(self, proposal_id: int, option: str, voter_id: str) -> Dict[str, Any]:
+            if len(title) + len(description) + sum(map(len, options)) > _OFFLOAD_BYTES:
+                encoded_args = await asyncio.to_thread(self._encode, params)
+            else:
+                encoded_args = self._encode(params)
+        except (TypeError, ValueError) as exc:
+            return CanisterResult(False, error=f"Encoding error: {exc}")
+        return await self._call_canister("createProposal", encoded_args, is_query=False, submit_only=submit_only)
+
+    async def cast_vote(self, proposal_id: int, option: str, voter_id: str, submit_only: bool = False) -> CanisterResult:
         """Cast a vote on a proposal"""
+        request_data = {"proposal_id": proposal_id, "option": option, "voter_id": voter_id}
+        try:
+            encoded_args = self._encode([{"type": _VOTE_REQUEST, "value": request_data}])
+        except (TypeError, ValueError) as exc:
+            return CanisterResult(False, error=f"Encoding error: {exc}")
+        return await self._call_canister("castVote", encoded_args, is_query=False, submit_only=submit_only)
+
+    async def cast_votes(self, votes: List[Tuple[int, str, str]], submit_only: bool = False) -> List[CanisterResult]:
+        """Cast several (proposal_id, option, voter_id) votes concurrently, one result per vote in input order."""
+        results = await asyncio.gather(
+            *(self._cast_vote_item(vote, submit_only) for vote in votes),
+            return_exceptions=True,
+        )
+        return [
+            CanisterResult(False, error=f"Network error: {r}") if isinstance(r, BaseException) else r
+            for r in results
+        ]
+
+    async def _cast_vote_item(self, vote: Tuple[int, str, str], submit_only: bool) -> CanisterResult:
+        """cast_vote for one cast_votes entry; a malformed entry fails only its own slot."""
         try:
-            vote_data = {
-                "proposal_id": proposal_id,
-                "option": option,
-                "voter_id": voter_id
-            }
-            
-            encoded_args = encode([{
-                "type": Types.Record({
-                    "proposal_id": Types.Nat,
-                    "option": Types.Text,
-                    "voter_id": Types.Text,
-                }),
-                "value": vote_data
-            }])
-            
-            return await self._call_canister("castVote", encoded_args, is_query=False)
-        except Exception as e:
-            logging.error(f"Error in cast_vote: {e}")
-            return {"success": False, "error": str(e)}
-
-    async def get_proposal(self, proposal_id: int) -> Dict[str, Any]:
+            proposal_id, option, voter_id = vote
+        except (TypeError, ValueError):
+            return CanisterResult(False, error=f"Encoding error: expected (proposal_id, option, voter_id), got {vote!r}")
+        return await self.cast_vote(proposal_id, option, voter_id, submit_only)
+
+    async def get_proposal(self, proposal_id: int) -> CanisterResult:
         """Get a specific proposal by ID"""
+        return await self._query_nat("getProposal", proposal_id)
+
+    async def get_proposals(self, proposal_ids: List[int]) -> List[CanisterResult]:
+        """Fetch several proposals concurrently, one result per ID in input order."""
+        return await self._query_many("getProposal", proposal_ids)
+
+    async def get_proposals_results(self, proposal_ids: List[int]) -> List[CanisterResult]:
+        """Fetch results for several proposals concurrently, in input order."""
+        return await self._query_many("getProposalResults", proposal_ids)
+
+    async def _query_many(self, method: str, proposal_ids: List[int]) -> List[CanisterResult]:
+        """Fan out one nat-argument query per ID; concurrency is bounded by max_in_flight."""
+        results = await asyncio.gather(
+            *(self._query_nat(method, proposal_id) for proposal_id in proposal_ids),
+            return_exceptions=True,
+        )
+        return [
+            CanisterResult(False, error=f"Network error: {r}") if isinstance(r, BaseException) else r
+            for r in results
+        ]
+
+    async def _query_nat(self, method: str, proposal_id: int) -> CanisterResult:
+        """Run a query whose only argument is a proposal ID (Candid nat)."""
         try:
-            encoded_args = encode([{"type": Types.Nat, "value": proposal_id}])
-            return await self._call_canister("getProposal", encoded_args, is_query=True)
-        except Exception as e:
-            logging.error(f"Error in get_proposal: {e}")
-            return {"success": False, "error": str(e)}
+            encoded_args = _encode_nat_arg(proposal_id)
+        except ValueError as exc:
+            return CanisterResult(False, error=f"Encoding error: {exc}")
+        return await self._call_canister(method, encoded_args, is_query=True)
 
-    async def get_active_proposals(self) -> Dict[str, Any]:
+    async def get_active_proposals(self) -> CanisterResult:
         """Get all active proposals"""
-        try:
-            # Empty args for methods with no parameters
-            encoded_args = encode([])
-            return await self._call_canister("getActiveProposals", encoded_args, is_query=True)
-        except Exception as e:
-            logging.error(f"Error in get_active_proposals: {e}")
-            return {"success": False, "error": str(e)}
-
-    async def get_proposal_results(self, proposal_id: int) -> Dict[str, Any]:
+        return await self._call_canister("getActiveProposals", _EMPTY_ARGS, is_query=True)
+
+    async def get_proposal_results(self, proposal_id: int) -> CanisterResult:
         """Get results for a specific proposal"""
-        try:
-            encoded_args = encode([{"type": Types.Nat, "value": proposal_id}])
-            return await self._call_canister("getProposalResults", encoded_args, is_query=True)
-        except Exception as e:
-            logging.error(f"Error in get_proposal_results: {e}")
-            return {"success": False, "error": str(e)}
+        return await self._query_nat("getProposalResults", proposal_id)
+
+    async def warm_up(self) -> None:
+        """Open a pooled connection before the first user request, e.g. at agent startup."""
+        if not self._is_local:
+            await self.get_active_proposals()
 
     async def close(self):
-        """Clean up resources (placeholder for compatibility)"""
+        """The pooled session is shared; use aclose_all() on shutdown."""
         pass
 
+    @classmethod
+    async def aclose_all(cls):
+        """Close the shared sessions of the running event loop (call once before it shuts down)."""
+        loop = asyncio.get_running_loop()
+        sessions = [_SESSIONS.pop(key) for key in [key for key in _SESSIONS if key[0] is loop]]
+        clients = [_HTTP2_CLIENTS.pop(key) for key in [key for key in _HTTP2_CLIENTS if key[0] is loop]]
+        for key in [key for key in _LIMITERS if key[0] is loop]:
+            del _LIMITERS[key]
+        _drop_closed_loops(_SESSIONS)
+        _drop_closed_loops(_HTTP2_CLIENTS)
+        _drop_closed_loops(_LIMITERS)
+        for session in sessions:
+            await session.close()
+        for client in clients:
+            await client.aclose()
+
 # Example usage matching your working pattern:
 async def example_usage():
     """Example showing how to use the canister client"""
-    client = CanisterClient("your-canister-id-here")
+    client = CanisterClient("http://127.0.0.1:4943/?canisterId=rdmx6-jaaaa-aaaaa-aaadq-cai")
     
     # Create a proposal
     result = await client.create_proposal(
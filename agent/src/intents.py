@@ -1,93 +1,158 @@
 import re
 from typing import Tuple, Dict, Any, Optional
 
+# Options accepted in the short "<option> on proposal <id>" form
+_VOTE_TOKENS = frozenset({"for", "against", "yes", "no"})
+
+# Entry cap for the classification cache; it is simply cleared when full.
+_CLASSIFY_CACHE_MAX = 256
+
+
+def _canonicalize(text: str) -> str:
+    """
+    Cache key for a stripped message: whitespace runs collapsed, trailing
+    ?!. dropped and ASCII lowercased. Messages with the same key always
+    classify the same way: every pattern is case-insensitive, accepts any
+    whitespace run between words and ignores trailing punctuation.
+    """
+    key = " ".join(text.split()).rstrip("?!.")
+    # Non-ASCII lowercasing can change lengths and word boundaries (e.g. U+0130)
+    return key.lower() if key.isascii() else key
+
 class IntentClassifier:
     """Simple but effective intent classification for governance actions"""
+
+    __slots__ = (
+        "create_patterns", "vote_patterns", "status_patterns", "list_patterns", "help_patterns",
+        "_help_re", "_create_re", "_list_re", "_prefilter_re",
+        "_title_re", "_desc_re", "_options_re", "_options_split_re",
+        "_vote_on_re", "_vote_short_re", "_proposal_id_re", "_cache",
+    )
     
     def __init__(self):
-        self.create_patterns = [
+        self.create_patterns = [re.compile(p, re.IGNORECASE) for p in [
             r"create\s+proposal",
             r"new\s+proposal", 
             r"propose\s+",
             r"submit\s+proposal"
-        ]
+        ]]
         
-        self.vote_patterns = [
+        self.vote_patterns = [re.compile(p, re.IGNORECASE) for p in [
             r"vote\s+(\w+)\s+on\s+proposal\s+(\d+)",
             r"i\s+vote\s+(\w+)",
             r"cast\s+vote\s+(\w+)",
             r"(\w+)\s+on\s+proposal\s+(\d+)"
-        ]
+        ]]
         
-        self.status_patterns = [
+        self.status_patterns = [re.compile(p, re.IGNORECASE) for p in [
             r"status\s+of\s+proposal\s+(\d+)",
             r"proposal\s+(\d+)\s+status",
             r"how\s+is\s+proposal\s+(\d+)",
             r"results\s+of\s+proposal\s+(\d+)"
-        ]
+        ]]
         
-        self.list_patterns = [
+        self.list_patterns = [re.compile(p, re.IGNORECASE) for p in [
             r"what\s+can\s+i\s+vote",
             r"active\s+proposals",
             r"show\s+proposals",
             r"list\s+proposals"
-        ]
+        ]]
         
-        self.help_patterns = [
+        self.help_patterns = [re.compile(p, re.IGNORECASE) for p in [
             r"help",
             r"what\s+can\s+you\s+do",
             r"how\s+to\s+use"
-        ]
+        ]]
+
+        # Each bucket tested by classify() merged into one alternation, so a
+        # single scan decides membership
+        self._help_re = self._combine(self.help_patterns)
+        self._create_re = self._combine(self.create_patterns)
+        self._list_re = self._combine(self.list_patterns)
+
+        # Every pattern above contains one of these words, so messages
+        # without any of them are UNKNOWN without running the buckets
+        self._prefilter_re = re.compile(r"propos|help|what|how", re.IGNORECASE)
+
+        # Extraction patterns, compiled once rather than looked up per message
+        self._title_re = re.compile(r"proposal:?\s+([^,\n]+)", re.IGNORECASE)
+        self._desc_re = re.compile(r"description:?\s+([^,\n]+)", re.IGNORECASE)
+        self._options_re = re.compile(r"options?\s+([^,\n]+)", re.IGNORECASE)
+        self._options_split_re = re.compile(r'[,\s]+and\s+|\s+or\s+|,')
+        self._vote_on_re = re.compile(r"vote\s+(\w+)\s+on\s+proposal\s+(\d+)", re.IGNORECASE)
+        self._vote_short_re = re.compile(r"(\w+)\s+on\s+proposal\s+(\d+)", re.IGNORECASE)
+        self._proposal_id_re = re.compile(r"proposal\s+(\d+)", re.IGNORECASE)
+
+        # Results for repeated messages (help, status, list...), keyed by _canonicalize()
+        self._cache: Dict[str, Tuple[str, Dict[str, Any]]] = {}
     
     def classify(self, message: str) -> Tuple[str, Dict[str, Any]]:
         """Classify user intent and extract parameters"""
-        msg_lower = message.lower().strip()
+        # All patterns are case-insensitive, so no lowercased copy is made
+        text = message.strip()
+        key = _canonicalize(text)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._classify(message, text)
+            # Proposal texts are one-off; caching them would only evict repeat queries
+            if cached[0] == "CREATE_PROPOSAL":
+                return cached
+            if len(self._cache) >= _CLASSIFY_CACHE_MAX:
+                self._cache.clear()
+            self._cache[key] = cached
+        # Callers get their own params dict so the cached one cannot be modified
+        return cached[0], dict(cached[1])
+
+    def _classify(self, message: str, text: str) -> Tuple[str, Dict[str, Any]]:
+        if not self._prefilter_re.search(text):
+            return "UNKNOWN", {}
         
         # Check for help
-        if self._matches_patterns(msg_lower, self.help_patterns):
+        if self._help_re.search(text):
             return "HELP", {}
         
         # Check for create proposal
-        if self._matches_patterns(msg_lower, self.create_patterns):
+        if self._create_re.search(text):
             params = self._extract_proposal_details(message)
             return "CREATE_PROPOSAL", params
         
         # Check for voting
-        vote_params = self._extract_vote_details(msg_lower)
+        vote_params = self._extract_vote_details(text)
         if vote_params:
             return "CAST_VOTE", vote_params
         
         # Check for status
-        status_params = self._extract_status_details(msg_lower)
+        status_params = self._extract_status_details(text)
         if status_params:
             return "CHECK_STATUS", status_params
         
         # Check for list active
-        if self._matches_patterns(msg_lower, self.list_patterns):
+        if self._list_re.search(text):
             return "LIST_ACTIVE", {}
         
         return "UNKNOWN", {}
     
-    def _matches_patterns(self, text: str, patterns: list) -> bool:
-        """Check if text matches any pattern in the list"""
-        return any(re.search(pattern, text, re.IGNORECASE) for pattern in patterns)
+    @staticmethod
+    def _combine(patterns: list) -> re.Pattern:
+        """Merge compiled patterns into a single alternation"""
+        return re.compile("|".join(f"(?:{p.pattern})" for p in patterns), re.IGNORECASE)
     
     def _extract_proposal_details(self, message: str) -> Dict[str, Any]:
         """Extract proposal creation details"""
         # Look for title after "proposal:"
-        title_match = re.search(r"proposal:?\s+([^,\n]+)", message, re.IGNORECASE)
+        title_match = self._title_re.search(message)
         title = title_match.group(1).strip() if title_match else "Untitled Proposal"
         
         # Look for description
-        desc_match = re.search(r"description:?\s+([^,\n]+)", message, re.IGNORECASE)
+        desc_match = self._desc_re.search(message)
         description = desc_match.group(1).strip() if desc_match else title
         
         # Look for options
-        options_match = re.search(r"options?\s+([^,\n]+)", message, re.IGNORECASE)
+        options_match = self._options_re.search(message)
         if options_match:
             options_text = options_match.group(1)
             # Split by common separators
-            options = [opt.strip() for opt in re.split(r'[,\s]+and\s+|\s+or\s+|,', options_text)]
+            options = [opt.strip() for opt in self._options_split_re.split(options_text)]
             options = [opt for opt in options if opt]  # Remove empty strings
         else:
             # Default options
@@ -103,7 +168,7 @@ class IntentClassifier:
     def _extract_vote_details(self, message: str) -> Optional[Dict[str, Any]]:
         """Extract voting details"""
         # Pattern: "vote [option] on proposal [id]"
-        match = re.search(r"vote\s+(\w+)\s+on\s+proposal\s+(\d+)", message, re.IGNORECASE)
+        match = self._vote_on_re.search(message)
         if match:
             return {
                 "option": match.group(1).title(),
@@ -111,8 +176,8 @@ class IntentClassifier:
             }
         
         # Pattern: "[option] on proposal [id]"
-        match = re.search(r"(\w+)\s+on\s+proposal\s+(\d+)", message, re.IGNORECASE)
-        if match and match.group(1).lower() in ['for', 'against', 'yes', 'no']:
+        match = self._vote_short_re.search(message)
+        if match and match.group(1).casefold() in _VOTE_TOKENS:
             return {
                 "option": match.group(1).title(),
                 "proposal_id": int(match.group(2))
@@ -122,7 +187,7 @@ class IntentClassifier:
     
     def _extract_status_details(self, message: str) -> Optional[Dict[str, Any]]:
         """Extract proposal ID for status checks"""
-        match = re.search(r"proposal\s+(\d+)", message, re.IGNORECASE)
+        match = self._proposal_id_re.search(message)
         if match:
             return {"proposal_id": int(match.group(1))}
         return None
\ No newline at end of file
@@ -1,6 +1,14 @@
 import re
 from typing import Any
 
+# Potentially harmful content rejected by validate_input. These are plain
+# substrings, so they are checked with `in` rather than the regex engine.
+_HARMFUL_SUBSTRINGS = ("<script", "javascript:", "eval(", "exec(")
+_HARMFUL_MIN_LEN = min(map(len, _HARMFUL_SUBSTRINGS))
+_DIGITS_RE = re.compile(r'\d+')
+_WS_RE = re.compile(r'\s+')
+_STRIP_RE = re.compile(r'[^\w\s.,!?-]+')
+
 def validate_input(message: str) -> bool:
     """Validate user input"""
     if not message or not isinstance(message, str):
@@ -10,42 +18,37 @@ def validate_input(message: str) -> bool:
     if len(message.strip()) < 2 or len(message) > 500:
         return False
     
-    # Check for potentially harmful content
-    harmful_patterns = [
-        r'<script',
-        r'javascript:',
-        r'eval\(',
-        r'exec\('
-    ]
+    # Short chat replies ("hi", "yes", "no") cannot contain any of them
+    if len(message) < _HARMFUL_MIN_LEN:
+        return True
     
-    msg_lower = message.lower()
-    if any(re.search(pattern, msg_lower) for pattern in harmful_patterns):
+    # Check for potentially harmful content
+    msg_folded = message.casefold()
+    if any(pattern in msg_folded for pattern in _HARMFUL_SUBSTRINGS):
         return False
     
     return True
 
 def format_response(response: Any) -> str:
     """Format response for chat display"""
-    if isinstance(response, dict):
-        return str(response)
-    elif isinstance(response, str):
+    # Handler replies are almost always short strings: one check, one compare
+    if isinstance(response, str):
         # Ensure response isn't too long for chat
         if len(response) > 1000:
             return response[:950] + "... (truncated)"
         return response
-    else:
-        return str(response)
+    return str(response)
 
 def extract_numbers(text: str) -> list:
     """Extract numbers from text"""
-    return [int(x) for x in re.findall(r'\d+', text)]
+    return [int(x) for x in _DIGITS_RE.findall(text)]
 
 def clean_text(text: str) -> str:
     """Clean and normalize text"""
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text.strip())
+    text = _WS_RE.sub(' ', text.strip())
     
     # Remove special characters except basic punctuation
-    text = re.sub(r'[^\w\s.,!?-]', '', text)
+    text = _STRIP_RE.sub('', text)
     
     return text
\ No newline at end of file
@@ -7,9 +7,12 @@ Tests the full flow: canister <-> agent communication
 import asyncio
 import sys
 import os
+from ic.candid import Types, encode
+from ic.principal import Principal
+from ic.utils import to_request_id
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'agent', 'src'))
 
-from canister_client import CanisterClient
+from canister_client import CanisterClient, cbor_dumps, cbor_loads
 from intents import IntentClassifier
 
 async def test_integration():
@@ -80,7 +83,7 @@ async def test_integration():
             print(f"   ❌ Failed to create proposal: {result['error']}")
             
         # Test 3: List active proposals
-        print("   Testing active proposals list...")
+        print("\n3. Testing active proposals list...")
         active_result = await client.get_active_proposals()
         
         if active_result['success']:
@@ -89,6 +92,47 @@ async def test_integration():
         else:
             print(f"   ❌ Failed to get active proposals: {active_result['error']}")
             
+        # Test 4: Result.Result replies as the canister encodes them
+        print("\n4. Testing Candid reply decoding...")
+        result_type = Types.Variant({"ok": Types.Nat, "err": Types.Text})
+        
+        err_reply = encode([{"type": result_type, "value": {"err": "Proposal not found"}}])
+        decoded = CanisterClient._decode_candid(err_reply, "createProposal")
+        if not decoded['success'] and decoded['error'] == "Proposal not found":
+            print("   ✅ #err reply decoded as a failure")
+        else:
+            print(f"   ❌ #err reply decoded as {decoded}")
+        
+        ok_reply = encode([{"type": result_type, "value": {"ok": 7}}])
+        decoded = CanisterClient._decode_candid(ok_reply, "createProposal")
+        if decoded['success'] and decoded['data'] == 7:
+            print("   ✅ #ok reply decoded as a success")
+        else:
+            print(f"   ❌ #ok reply decoded as {decoded}")
+        
+        # getProposal replies with Result<Proposal, Text>; field names must survive decoding
+        proposal_type = Types.Record({
+            "id": Types.Nat, "title": Types.Text, "description": Types.Text,
+            "options": Types.Vec(Types.Text), "votes": Types.Vec(Types.Tuple(Types.Text, Types.Nat)),
+            "voters": Types.Vec(Types.Text), "created": Types.Int, "deadline": Types.Int,
+            "status": Types.Variant({"Active": Types.Null, "Closed": Types.Null}), "creator": Types.Text,
+        })
+        proposal = {
+            "id": 3, "title": "Fund the marketing campaign", "description": "", "options": ["For", "Against"],
+            "votes": [("For", 1)], "voters": ["test-voter-1"], "created": 0, "deadline": 1,
+            "status": {"Active": None}, "creator": "test-user",
+        }
+        proposal_reply = encode([{"type": Types.Variant({"ok": proposal_type, "err": Types.Text}), "value": {"ok": proposal}}])
+        decoded = CanisterClient._decode_candid(proposal_reply, "getProposal")
+        if decoded['success'] and decoded['data']['title'] == proposal['title'] and decoded['data']['status'] == {"Active": None}:
+            print("   ✅ getProposal reply decoded with field names")
+        else:
+            print(f"   ❌ getProposal reply decoded as {decoded}")
+        
+        # Test 5: Request encoding and the gateway round trips, against a fake transport
+        print("\n5. Testing request encoding and transport...")
+        await test_transport()
+            
     except Exception as e:
         print(f"❌ Integration test failed: {str(e)}")
     finally:
@@ -96,5 +140,73 @@ async def test_integration():
     
     print("\n✅ Integration tests complete!")
 
+async def test_transport():
+    """Exercise envelope building, read_state polling, retries and the query cache without a network"""
+    remote = CanisterClient("rrkah-fqaaa-aaaaa-aaaaq-cai")
+    vote_args = encode([{"type": Types.Record({"proposal_id": Types.Nat, "option": Types.Text, "voter_id": Types.Text}),
+                         "value": {"proposal_id": 1, "option": "For", "voter_id": "test-voter-1"}}])
+    
+    # Request ID must be the IC's representation-independent hash of the envelope content
+    url, envelope, request_id = remote._build_envelope("castVote", vote_args, is_query=False)
+    content = cbor_loads(envelope)["content"]
+    expected = {
+        "request_type": "call",
+        "sender": Principal.anonymous().bytes,
+        "canister_id": Principal.from_str("rrkah-fqaaa-aaaaa-aaaaq-cai").bytes,
+        "method_name": "castVote",
+        "arg": vote_args,
+    }
+    if url.path.endswith("/call") and all(content.get(k) == v for k, v in expected.items()):
+        print("   ✅ Update envelope carries the expected content")
+    else:
+        print(f"   ❌ Unexpected update envelope: {content}")
+    if request_id == to_request_id(content):
+        print("   ✅ Request ID matches ic-py's to_request_id")
+    else:
+        print("   ❌ Request ID does not match ic-py's to_request_id")
+    if remote._build_envelope("castVote", vote_args, is_query=False)[2] != request_id:
+        print("   ✅ Identical updates get distinct request IDs")
+    else:
+        print("   ❌ Identical updates share a request ID")
+    
+    # Fake gateway: updates are accepted (202), read_state answers with a
+    # certificate tree holding the reply, and the first query gets a 503.
+    vote_reply = encode([{"type": Types.Variant({"ok": Types.Text, "err": Types.Text}), "value": {"ok": "Vote cast successfully"}}])
+    sent = []
+    
+    async def fake_send_once(url, envelope):
+        sent.append(url.path.rsplit("/", 1)[-1])
+        if sent[-1] == "call":
+            return 202, b""
+        if sent[-1] == "read_state":
+            path = cbor_loads(envelope)["content"]["paths"][0]
+            status = [1, [2, b"reply", [3, vote_reply]], [2, b"status", [3, b"replied"]]]
+            tree = [1, [0], [2, path[0], [2, path[1], status]]]
+            return 200, cbor_dumps({"certificate": cbor_dumps({"tree": tree})})
+        if sent.count("query") == 1:
+            return 503, b"overloaded"
+        reply = encode([{"type": Types.Vec(Types.Null), "value": []}])
+        return 200, cbor_dumps({"status": "replied", "reply": {"arg": reply}})
+    
+    remote._send_once = fake_send_once
+    
+    submitted = await remote.cast_vote(1, "For", "test-voter-1", submit_only=True)
+    outcome = await remote.await_result(submitted['data'], "castVote") if submitted['success'] else submitted
+    if outcome['success'] and outcome['data'] == "Vote cast successfully":
+        print("   ✅ submit_only request ID resolves through read_state")
+    else:
+        print(f"   ❌ submit_only/await_result gave {submitted} / {outcome}")
+    
+    first = await remote.get_active_proposals()
+    second = await remote.get_active_proposals()
+    if first['success'] and sent.count("query") == 2:
+        print("   ✅ Query retried after HTTP 503")
+    else:
+        print(f"   ❌ Query retry failed: {first}, sent {sent}")
+    if second['success'] and sent.count("query") == 2:
+        print("   ✅ Repeated query served from the cache")
+    else:
+        print(f"   ❌ Repeated query was sent again: {sent}")
+
 if __name__ == "__main__":
     asyncio.run(test_integration())
\ No newline at end of file